@@ -25,18 +25,18 @@ app.get('/health', (req, res) => {
 // search profiles endpoint
 app.get('/api/search', async (req, res) => {
   try {
-    const { query, num_results = 10 } = req.query;
+    const { query, num_results = 10, offset = 0 } = req.query;
     
     if (!query) {
       return res.status(400).json({ error: 'query parameter is required' });
     }
 
-    console.log(`searching for: "${query}" (${num_results} results)`);
+    console.log(`searching for: "${query}" (${num_results} results from ${offset})`);
     console.log(`calling ML service at: ${PYTHON_ML_URL}`);
 
     // call Python ML service
     const response = await axios.get(`${PYTHON_ML_URL}/search`, {
-      params: { query, num_results },
+      params: { query, num_results, offset },
       timeout: 10000
     });
 
@@ -1,30 +1,53 @@
 import json
 import os
 import numpy as np
-from typing import List, Dict, Any
-import openai
-from openai import OpenAI
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 from dotenv import load_dotenv
+from dedup import vector_canonical_ids
+from profile_store import read_profiles_parquet, read_column_parquet
 
-load_dotenv()
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 # paths
 PROCESSED_JSON = "src/data/processed/profiles.json"
+PROCESSED_PARQUET = "src/data/processed/profiles.parquet"
+PROFILES_MANIFEST = "src/data/processed/profiles_manifest.json"
 EMBEDDINGS_JSON = "src/data/processed/embeddings.json"
 EMBEDDINGS_NPY = "src/data/processed/embeddings.npy"
 EMBEDDINGS_META = "src/data/processed/embeddings_metadata.json"
+CANONICAL_IDS_JSON = "src/data/processed/canonical_ids.json"
 
-# openai configuration
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY') 
+# openai configuration (api key is read in main() after loading .env)
 EMBEDDING_MODEL = "text-embedding-3-small"
 
-def load_profiles():
-    """Load the processed profiles"""
-    with open(PROCESSED_JSON, 'r', encoding='utf-8') as f:
+def profiles_source() -> str:
+    """Processed profiles file written by the last preprocess.py run (json if it left no manifest)"""
+    if os.path.exists(PROFILES_MANIFEST):
+        with open(PROFILES_MANIFEST, 'r', encoding='utf-8') as f:
+            return json.load(f)['profiles_file']
+    return PROCESSED_JSON
+
+def load_profiles(columns: Optional[List[str]] = None) -> List[Dict]:
+    """Load the processed profiles, optionally only the given columns"""
+    source = profiles_source()
+    if source == PROCESSED_PARQUET:
+        return read_profiles_parquet(source, columns)
+    
+    with open(source, 'r', encoding='utf-8') as f:
         profiles = json.load(f)
+    if columns:
+        profiles = [{c: p.get(c) for c in columns} for p in profiles]
     return profiles
 
-def create_embeddings_openai(texts: List[str], client: OpenAI) -> List[List[float]]:
+def load_embedding_texts() -> List[str]:
+    """Load only the embedding_text of each processed profile"""
+    source = profiles_source()
+    if source == PROCESSED_PARQUET:
+        return read_column_parquet(source, 'embedding_text')
+    return [profile['embedding_text'] for profile in load_profiles()]
+
+def create_embeddings_openai(texts: List[str], client: "OpenAI") -> List[List[float]]:
     """Create embeddings using OpenAI API"""
     print("creating embeddings with OpenAI...")
     
@@ -68,57 +91,88 @@ def create_embeddings_local(texts: List[str]) -> List[List[float]]:
         print("sentence-transformers not installed; install with: pip install sentence-transformers")
         return None
 
-def save_embeddings(profiles: List[Dict], embeddings: List[List[float]]):
-    """Save embeddings in multiple formats"""
+def save_embeddings(
+    profiles: Optional[List[Dict]],
+    embeddings: List[List[float]],
+    profiles_file: str = PROCESSED_JSON,
+    names: Optional[List[str]] = None,
+):
+    """Save embeddings in multiple formats.
+
+    profiles is None for parquet input: the service reads profiles straight
+    from profiles_file, so the json copy with embeddings is skipped.
+    """
     
     # 1. save as json with profiles
-    print("saving embeddings as json...")
-    profiles_with_embeddings = []
-    
-    for profile, embedding in zip(profiles, embeddings):
-        profile_copy = profile.copy()
-        profile_copy['embedding'] = embedding
-        profiles_with_embeddings.append(profile_copy)
-    
-    with open(EMBEDDINGS_JSON, 'w', encoding='utf-8') as f:
-        json.dump(profiles_with_embeddings, f, ensure_ascii=False, indent=2)
+    if profiles is not None:
+        print("saving embeddings as json...")
+        profiles_with_embeddings = []
+        
+        for profile, embedding in zip(profiles, embeddings):
+            profile_copy = profile.copy()
+            profile_copy['embedding'] = embedding
+            profiles_with_embeddings.append(profile_copy)
+        
+        with open(EMBEDDINGS_JSON, 'w', encoding='utf-8') as f:
+            json.dump(profiles_with_embeddings, f, ensure_ascii=False, indent=2)
     
     # 2. save as numpy array (for fast loading)
     print("saving embeddings as numpy array...")
     embeddings_array = np.array(embeddings)
     np.save(EMBEDDINGS_NPY, embeddings_array)
     
-    # 3. save metadata for easy loading
+    # 3. save canonical row per embedding so search can collapse near-duplicate vectors
+    print("finding near-duplicate embeddings...")
+    if names is None and profiles is not None:
+        names = [profile.get('name', '') for profile in profiles]
+    canonical_ids = vector_canonical_ids(embeddings_array, names) if embeddings else []
+    num_duplicates = sum(1 for i, c in enumerate(canonical_ids) if i != c)
+    with open(CANONICAL_IDS_JSON, 'w') as f:
+        json.dump(canonical_ids, f)
+    
+    # 4. save metadata for easy loading
     metadata = {
-        'num_profiles': len(profiles),
+        'num_profiles': len(embeddings),
         'embedding_dimension': len(embeddings[0]) if embeddings else 0,
         'model_used': EMBEDDING_MODEL,
-        'profiles_file': PROCESSED_JSON,
-        'embeddings_file': EMBEDDINGS_NPY
+        'profiles_file': profiles_file,
+        'embeddings_file': EMBEDDINGS_NPY,
+        'canonical_ids_file': CANONICAL_IDS_JSON,
+        'num_vector_duplicates': num_duplicates
     }
     
     with open(EMBEDDINGS_META, 'w') as f:
         json.dump(metadata, f, indent=2)
     
     print(f"embeddings saved to:")
-    print(f"- {EMBEDDINGS_JSON} (profiles + embeddings)")
+    if profiles is not None:
+        print(f"- {EMBEDDINGS_JSON} (profiles + embeddings)")
     print(f"- {EMBEDDINGS_NPY} (numpy array)")
+    print(f"- {CANONICAL_IDS_JSON} (canonical row per embedding, {num_duplicates} duplicates)")
     print(f"- {EMBEDDINGS_META} (metadata)")
 
 def main():
     """Main function to create embeddings"""
+    load_dotenv()
+    openai_api_key = os.getenv('OPENAI_API_KEY')
     
-    # load profiles
-    profiles = load_profiles()
-    
-    # extract embedding texts
-    texts = [profile['embedding_text'] for profile in profiles]
-    print(f"extracted {len(texts)} embedding texts")
+    # load embedding texts; parquet input reads only that column
+    source = profiles_source()
+    if source == PROCESSED_PARQUET:
+        profiles = None
+        texts = load_embedding_texts()
+        names = read_column_parquet(source, 'name')
+    else:
+        profiles = load_profiles()
+        texts = [profile['embedding_text'] for profile in profiles]
+        names = [profile.get('name', '') for profile in profiles]
+    print(f"extracted {len(texts)} embedding texts from {source}")
     
     # try OpenAI API first (better quality)
-    if OPENAI_API_KEY:
+    if openai_api_key:
         print("using OpenAI API for embeddings")
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        from openai import OpenAI
+        client = OpenAI(api_key=openai_api_key)
         embeddings = create_embeddings_openai(texts, client)
     else:
         print("OpenAI API key not found; using local model instead.")
@@ -127,9 +181,9 @@ def main():
             return
     
     # save embeddings
-    save_embeddings(profiles, embeddings)
+    save_embeddings(profiles, embeddings, source, names)
     
-    print(f"\nsuccessfully created embeddings for {len(profiles)} profiles")
+    print(f"\nsuccessfully created embeddings for {len(texts)} profiles")
     print(f"embedding dimension: {len(embeddings[0]) if embeddings else 0}")
 
 if __name__ == "__main__":
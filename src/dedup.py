@@ -0,0 +1,183 @@
+import re
+import zlib
+import numpy as np
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple
+from vectors import normalize_rows
+
+# minhash / LSH configuration
+SHINGLE_SIZE = 5  # words per shingle
+NUM_PERM = 128
+LSH_BANDS = 16  # 16 bands x 8 rows puts the LSH threshold near 0.7 jaccard
+NEAR_DUP_JACCARD = 0.85
+NEAR_DUP_COSINE = 0.97
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+class UnionFind:
+    """Disjoint sets over row indices; the smallest index is each group's canonical row"""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+    def canonical(self) -> List[int]:
+        return [self.find(i) for i in range(len(self.parent))]
+
+def normalize_url(url: str) -> str:
+    """Normalize a profile url so trivial variants share one key"""
+    url = (url or '').strip().lower()
+    url = re.sub(r'^https?://(www\.)?', '', url)
+    url = url.split('?')[0].split('#')[0]
+    return url.rstrip('/')
+
+def normalize_name(name: str) -> str:
+    """Lowercase a name and keep only its word characters, so punctuation and spacing variants agree"""
+    return ' '.join(re.findall(r'\w+', (name or '').lower()))
+
+def strip_name_line(embedding_text: str) -> str:
+    """Drop the 'Name:' line so near-duplicate scoring compares only the rest of the profile"""
+    return '\n'.join(line for line in (embedding_text or '').split('\n') if not line.startswith('Name:'))
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Hash the word shingles of text to uint32 values"""
+    words = re.findall(r'\w+', (text or '').lower())
+    if len(words) < size:
+        grams = [' '.join(words)] if words else []
+    else:
+        grams = [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.unique(np.array([zlib.crc32(g.encode('utf-8')) for g in grams], dtype=np.uint64))
+
+def minhash_permutations(num_perm: int = NUM_PERM, seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """Coefficients (a, b) of the num_perm universal hash functions"""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    return a, b
+
+def minhash_signature(text: str, a: np.ndarray, b: np.ndarray) -> Optional[np.ndarray]:
+    """MinHash signature of text, or None if it has no shingles"""
+    hashes = shingles(text)
+    if len(hashes) == 0:
+        return None
+    # universal hashing (a*x + b) mod p, one permutation per column
+    permuted = ((np.outer(hashes, a) + b) % _MERSENNE_PRIME) & _MAX_HASH
+    return permuted.min(axis=0)
+
+class ProfileDeduplicator:
+    """Incremental exact-key and MinHash LSH dedup; the first profile seen in a group is canonical.
+
+    Profiles are fed one at a time so preprocessing can stream rows straight
+    to disk without holding the whole corpus. Kept profiles are numbered in
+    the order they are added, which is their row in the processed output. Near-duplicates are scored on
+    embedding_text without its name line and must also have the same
+    normalized name, so different people sharing boilerplate are kept.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_JACCARD, bands: int = LSH_BANDS, num_perm: int = NUM_PERM):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.a, self.b = minhash_permutations(num_perm)
+        self.exact_keys: Dict[Tuple[str, str], int] = {}
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+        self.signatures: List[np.ndarray] = []
+        self.canonical_rows: List[int] = []
+        self.canonical_names: List[str] = []
+        self.kept = 0
+
+    def add(self, profile: Dict[str, Any]) -> Optional[int]:
+        """Register profile; return the output row of its canonical profile if it is a duplicate, else None"""
+        keys = [
+            ('profile_id', str(profile.get('profile_id') or '').strip()),
+            ('profile_url', normalize_url(profile.get('profile_url', ''))),
+        ]
+        keys = [k for k in keys if k[1]]
+        for k in keys:
+            if k in self.exact_keys:
+                return self.exact_keys[k]
+
+        name = normalize_name(profile.get('name', ''))
+        signature = minhash_signature(strip_name_line(profile.get('embedding_text', '')), self.a, self.b)
+        bands = []
+        if signature is not None:
+            bands = [
+                signature[i * self.rows_per_band:(i + 1) * self.rows_per_band].tobytes()
+                for i in range(self.bands)
+            ]
+            candidates = set()
+            for band, bucket in zip(bands, self.buckets):
+                candidates.update(bucket.get(band, ()))
+            # verify candidates with the signature-estimated jaccard similarity
+            for c in sorted(candidates):
+                if self.canonical_names[c] != name:
+                    continue
+                if (self.signatures[c] == signature).mean() >= self.threshold:
+                    return self.canonical_rows[c]
+
+        # new canonical profile
+        row = self.kept
+        self.kept += 1
+        for k in keys:
+            self.exact_keys[k] = row
+        if signature is not None:
+            index = len(self.signatures)
+            self.signatures.append(signature)
+            self.canonical_rows.append(row)
+            self.canonical_names.append(name)
+            for band, bucket in zip(bands, self.buckets):
+                bucket[band].append(index)
+        return None
+
+def vector_canonical_ids(
+    embeddings,
+    names: Optional[List[str]] = None,
+    threshold: float = NEAR_DUP_COSINE,
+    block_size: int = 256,
+) -> List[int]:
+    """Map each embedding row to the smallest index of its group, linking rows with cosine similarity >= threshold.
+
+    When names are given, rows are only linked if their normalized names agree,
+    matching the MinHash stage, so different people with boilerplate profiles stay separate.
+    """
+    matrix = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    normalized_names = [normalize_name(n) for n in names] if names is not None else None
+    groups = UnionFind(len(matrix))
+    for start in range(0, len(matrix), block_size):
+        block = matrix[start:start + block_size]
+        # only compare against later rows so each pair is scored once
+        sims = block @ matrix[start:].T
+        rows, cols = np.nonzero(sims >= threshold)
+        for r, c in zip(rows, cols):
+            i, j = start + r, start + c
+            if i >= j:
+                continue
+            if normalized_names is not None and normalized_names[i] != normalized_names[j]:
+                continue
+            groups.union(int(i), int(j))
+    return groups.canonical()
+
+def collapse_duplicates(indices, scores, canonical_ids: Optional[List[int]], limit: int) -> List[Tuple[int, float]]:
+    """Keep the best-scoring row of each canonical group, up to limit results"""
+    results = []
+    seen = set()
+    for i, score in zip(indices, scores):
+        group = canonical_ids[i] if canonical_ids is not None else i
+        if group in seen:
+            continue
+        seen.add(group)
+        results.append((int(i), float(score)))
+        if len(results) >= limit:
+            break
+    return results
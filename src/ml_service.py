@@ -1,31 +1,160 @@
+import asyncio
 import json
 import numpy as np
 import os
-from typing import List, Dict
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Dict, Tuple
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from requests import SearchRequest
-from openai import OpenAI
-from sklearn.metrics.pairwise import cosine_similarity
+from requests import SearchRequest, ShardSearchRequest
+from dedup import collapse_duplicates
+from profile_store import read_profiles_parquet
+from result_cache import ResultCache, normalize_query
+from sharding import shard_bounds, merge_top_k, parallel_top_k
+from vectors import normalize_rows, normalize_vector
 
 load_dotenv()
 
 # configuration
 EMBEDDINGS_JSON = "src/data/processed/embeddings.json"
 EMBEDDINGS_NPY = "src/data/processed/embeddings.npy"
+EMBEDDINGS_META = "src/data/processed/embeddings_metadata.json"
+CANONICAL_IDS_JSON = "src/data/processed/canonical_ids.json"
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 EMBEDDING_MODEL = "text-embedding-3-small"
 
-# load data
-print("loading profiles and embeddings...")
-with open(EMBEDDINGS_JSON, 'r', encoding='utf-8') as f:
-    profiles = json.load(f)
-embeddings = np.load(EMBEDDINGS_NPY)
-print(f"loaded {len(profiles)} profiles with {len(embeddings)} embeddings")
+# sharding configuration
+# SEARCH_SHARDS: split the in-process matrix into N shards scored on a thread pool
+# SHARD_URLS: comma-separated ml_service shard servers; this process becomes a coordinator
+# SHARD_INDEX/SHARD_COUNT: run this process as shard server SHARD_INDEX of SHARD_COUNT
+SEARCH_SHARDS = int(os.getenv('SEARCH_SHARDS', '1'))
+SHARD_URLS = [u.strip().rstrip('/') for u in os.getenv('SHARD_URLS', '').split(',') if u.strip()]
+SHARD_INDEX = int(os.getenv('SHARD_INDEX', '0'))
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', '1'))
+SHARD_TIMEOUT = float(os.getenv('SHARD_TIMEOUT', '5'))
+if SHARD_COUNT > 1 and not 0 <= SHARD_INDEX < SHARD_COUNT:
+    raise ValueError(f"SHARD_INDEX must be in [0, {SHARD_COUNT}), got {SHARD_INDEX}")
+
+# result cache configuration: each entry holds the top SEARCH_CACHE_DEPTH ranked
+# (index, score) pairs for a query so "load more" pages are served without re-searching
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '256'))
+SEARCH_CACHE_TTL = float(os.getenv('SEARCH_CACHE_TTL', '600'))
+SEARCH_CACHE_DEPTH = int(os.getenv('SEARCH_CACHE_DEPTH', '500'))
+
+# data is loaded by the lifespan hook, not at import
+profiles: List[Dict] = []
+embeddings = None  # row-normalized float32 matrix (this shard's rows only in shard server mode)
+shard_offset = 0  # global index of embeddings[0]
+canonical_ids = None  # canonical row per profile, used to collapse duplicates in results
+data_ready = False
+
+# OpenAI client is created on first use
+_client = None
+
+# ranked candidates keyed by (normalized query, embedding model)
+results_cache = ResultCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+
+# thread pool for in-process shards and shard server fan-out
+_executor = None
+
+def load_metadata() -> Dict:
+    """Load embeddings_metadata.json, or an empty dict if it is missing"""
+    if not os.path.exists(EMBEDDINGS_META):
+        return {}
+    with open(EMBEDDINGS_META, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def check_row_counts(source: str, count: int, expected: int | None):
+    """Refuse to pair profiles and embeddings whose row counts disagree"""
+    if expected is not None and count != expected:
+        raise ValueError(
+            f"{source} has {count} rows but {expected} were expected; "
+            "re-run create_embeddings.py after preprocess.py"
+        )
+
+def load_profiles(metadata: Dict) -> List[Dict]:
+    """Load profiles from the parquet file the embeddings were built from, else embeddings.json"""
+    profiles_file = metadata.get('profiles_file')
+    if profiles_file and profiles_file.endswith('.parquet') and os.path.exists(profiles_file):
+        return read_profiles_parquet(profiles_file)
+
+    with open(EMBEDDINGS_JSON, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_data():
+    """Load profiles and embeddings into module state"""
+    global profiles, embeddings, shard_offset, canonical_ids, data_ready
+
+    # cached rankings refer to row indices of the previous data
+    results_cache.clear()
+    metadata = load_metadata()
+    num_profiles = metadata.get('num_profiles')
+
+    if SHARD_COUNT > 1:
+        # shard server: hold only this shard's slice of the embedding matrix
+        print(f"loading embeddings shard {SHARD_INDEX + 1}/{SHARD_COUNT}...")
+        full = np.load(EMBEDDINGS_NPY, mmap_mode='r')
+        check_row_counts(EMBEDDINGS_NPY, len(full), num_profiles)
+        bounds = shard_bounds(len(full), SHARD_COUNT)
+        # fewer rows than shards leaves the trailing shards empty
+        start, end = bounds[SHARD_INDEX] if SHARD_INDEX < len(bounds) else (len(full), len(full))
+        embeddings = normalize_rows(np.asarray(full[start:end], dtype=np.float32))
+        shard_offset = start
+        data_ready = True
+        print(f"loaded embeddings {start}-{end} of {len(full)}")
+        return
+
+    print("loading profiles and embeddings...")
+    loaded_profiles = load_profiles(metadata)
+    check_row_counts("profiles", len(loaded_profiles), num_profiles)
+    if os.path.exists(CANONICAL_IDS_JSON):
+        with open(CANONICAL_IDS_JSON, 'r', encoding='utf-8') as f:
+            canonical_ids = json.load(f)
+        if len(canonical_ids) != len(loaded_profiles):
+            print(f"ignoring {CANONICAL_IDS_JSON}: {len(canonical_ids)} ids for {len(loaded_profiles)} profiles")
+            canonical_ids = None
+
+    if SHARD_URLS:
+        # coordinator: embeddings live on the shard servers
+        profiles = loaded_profiles
+        data_ready = True
+        print(f"loaded {len(profiles)} profiles; searching {len(SHARD_URLS)} shard servers")
+        return
+
+    # pre-normalize rows so cosine similarity is a single matrix-vector product
+    loaded = normalize_rows(np.load(EMBEDDINGS_NPY).astype(np.float32))
+    check_row_counts(EMBEDDINGS_NPY, len(loaded), len(loaded_profiles))
+    profiles, embeddings = loaded_profiles, loaded
+
+    data_ready = True
+    print(f"loaded {len(profiles)} profiles with {len(embeddings)} embeddings")
+
+async def load_data_in_background():
+    """Run load_data off the event loop; on failure the service stays not ready"""
+    try:
+        await asyncio.to_thread(load_data)
+    except Exception as e:
+        print(f"failed to load profiles and embeddings: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _executor
+    workers = max(SEARCH_SHARDS, len(SHARD_URLS))
+    if workers > 1:
+        _executor = ThreadPoolExecutor(max_workers=workers)
+    # load in the background so /health answers immediately and /ready reports 503 until done
+    app.state.load_task = asyncio.create_task(load_data_in_background())
+    yield
+    app.state.load_task.cancel()
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
 
 # create FastAPI app
-app = FastAPI(title="Brew", version="1.0.0")
+app = FastAPI(title="Brew", version="1.0.0", lifespan=lifespan)
 
 # add CORS middleware
 app.add_middleware(
@@ -36,11 +165,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# create OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+def get_client():
+    """Return the shared OpenAI client, creating it on first use"""
+    global _client
+    if _client is None and OPENAI_API_KEY:
+        from openai import OpenAI
+        _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
+
+def require_ready():
+    """Reject requests that need data before the lifespan hook has loaded it"""
+    if not data_ready:
+        raise HTTPException(status_code=503, detail="profiles and embeddings not loaded yet")
 
 def create_query_embedding(query: str) -> List[float]:
     """Create embedding for search query"""
+    client = get_client()
     if not client:
         raise HTTPException(status_code=500, detail="OpenAI API key not configured")
     
@@ -50,26 +190,75 @@ def create_query_embedding(query: str) -> List[float]:
     )
     return response.data[0].embedding
 
-def search_profiles(query: str, num_results: int = 10) -> List[Dict]:
-    """Search profiles using semantic similarity"""
+def query_shard_server(url: str, query_embedding: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Ask one shard server for its local top-k"""
+    body = json.dumps({"embedding": query_embedding.tolist(), "k": k}).encode('utf-8')
+    req = urllib.request.Request(
+        f"{url}/shard/search",
+        data=body,
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=SHARD_TIMEOUT) as response:
+        data = json.loads(response.read())
+    return np.asarray(data['indices'], dtype=np.int64), np.asarray(data['scores'], dtype=np.float32)
+
+def top_k_candidates(query_embedding: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the global top-k (indices, scores) from local shards or shard servers"""
+    if SHARD_URLS:
+        if _executor is not None:
+            partials = list(_executor.map(lambda url: query_shard_server(url, query_embedding, k), SHARD_URLS))
+        else:
+            partials = [query_shard_server(url, query_embedding, k) for url in SHARD_URLS]
+        return merge_top_k(partials, k)
+
+    return parallel_top_k(query_embedding, embeddings, k, SEARCH_SHARDS, _executor)
+
+def rank_profiles(query: str, depth: int) -> List[Tuple[int, float]]:
+    """Rank up to depth distinct profiles for query as (index, score) pairs, best first"""
+    query_embedding = normalize_vector(create_query_embedding(query))
+    
+    # cosine similarities against the pre-normalized matrix, merged across shards;
+    # over-fetch until enough distinct people survive duplicate collapsing
+    k = depth if canonical_ids is None else depth * 2
+    while True:
+        top_indices, top_scores = top_k_candidates(query_embedding, k)
+        top = collapse_duplicates(top_indices, top_scores, canonical_ids, depth)
+        if len(top) >= depth or k >= len(profiles):
+            return top
+        k *= 2
+
+def search_profiles(query: str, num_results: int = 10, offset: int = 0) -> List[Dict]:
+    """Search profiles using semantic similarity, returning num_results starting at offset"""
+    require_ready()
+    if SHARD_COUNT > 1:
+        raise HTTPException(status_code=400, detail="shard servers only answer /shard/search; query the coordinator")
+    if num_results < 1:
+        raise HTTPException(status_code=400, detail="num_results must be at least 1")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must be non-negative")
     try:
-        # create query embedding
-        query_embedding = create_query_embedding(query)
-        query_embedding = np.array(query_embedding).reshape(1, -1)
-        
-        # calculate similarities
-        similarities = cosine_similarity(query_embedding, embeddings)[0]
-        top_indices = np.argsort(similarities)[::-1][:num_results]
+        end = offset + num_results
+        if end <= SEARCH_CACHE_DEPTH:
+            # serve pages from the cached ranking, ranking SEARCH_CACHE_DEPTH candidates on a miss
+            key = (normalize_query(query), EMBEDDING_MODEL)
+            ranked = results_cache.get(key)
+            if ranked is None:
+                ranked = rank_profiles(query, SEARCH_CACHE_DEPTH)
+                results_cache.put(key, ranked)
+        else:
+            # deeper than the cache holds: rank directly
+            ranked = rank_profiles(query, end)
         
         # prepare results - return clean profile data
         results = []
-        for i in top_indices:
+        for i, score in ranked[offset:end]:
             profile = profiles[i].copy()
             # remove the raw embedding data
             if 'embedding' in profile:
                 del profile['embedding']
             # add similarity score
-            profile['similarity_score'] = float(similarities[i])
+            profile['similarity_score'] = float(score)
             results.append(profile)
         
         return results
@@ -87,28 +276,49 @@ async def health_check():
     return {
         "status": "healthy",
         "profiles_loaded": len(profiles),
-        "embeddings_loaded": len(embeddings),
-        "openai_configured": client is not None
+        "embeddings_loaded": 0 if embeddings is None else len(embeddings),
+        "openai_configured": bool(OPENAI_API_KEY)
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until profiles and embeddings are loaded"""
+    require_ready()
+    return {"status": "ready"}
+
+# search handlers are plain def so FastAPI runs them in its threadpool; scoring and
+# blocking shard/OpenAI calls then never stall the event loop
 @app.get("/search")
-async def search_endpoint(query: str, num_results: int = 10):
+def search_endpoint(query: str, num_results: int = 10, offset: int = 0):
     """Search profiles endpoint (GET)"""
     if not query:
         raise HTTPException(status_code=400, detail="query parameter is required")
     
-    results = search_profiles(query, num_results)
+    results = search_profiles(query, num_results, offset)
     return results
 
 @app.post("/search")
-async def search_post(request: SearchRequest):
+def search_post(request: SearchRequest):
     """Search profiles endpoint (POST)"""
-    results = search_profiles(request.query, request.num_results)
+    results = search_profiles(request.query, request.num_results, request.offset)
     return results
 
+@app.post("/shard/search")
+def shard_search(request: ShardSearchRequest):
+    """Score this process's embeddings and return the local top-k with global indices"""
+    require_ready()
+    if embeddings is None:
+        raise HTTPException(status_code=400, detail="this instance holds no embeddings")
+    
+    indices, scores = parallel_top_k(
+        normalize_vector(request.embedding), embeddings, request.k, SEARCH_SHARDS, _executor, shard_offset
+    )
+    return {"indices": indices.tolist(), "scores": scores.tolist()}
+
 @app.get("/profile/{profile_id}")
 async def get_profile(profile_id: str):
     """Get specific profile by ID"""
+    require_ready()
     try:
         profile_id = int(profile_id)
         if 0 <= profile_id < len(profiles):
@@ -120,6 +330,7 @@ async def get_profile(profile_id: str):
 
 @app.get("/profiles")
 async def get_all_profiles(limit: int | None = None):
+    require_ready()
     data = profiles if limit is None or limit <= 0 else profiles[:limit]
     return {
             "total": len(profiles), 
@@ -137,6 +348,7 @@ async def generate_message(request: dict):
         if not profile or not your_context:
             raise HTTPException(status_code=400, detail="profile and yourContext are required")
         
+        client = get_client()
         if not client:
             raise HTTPException(status_code=500, detail="OpenAI API key not configured")
         
@@ -1,12 +1,17 @@
-import pandas as pd
+import argparse
 import json
 import os
 import re
 from typing import List, Dict, Any
+from dedup import ProfileDeduplicator
+from profile_store import ROW_GROUP_SIZE
 
 # paths
 RAW_CSV = "src/data/raw/linkedinuserprofiles.csv"
 PROCESSED_JSON = "src/data/processed/profiles.json"
+PROCESSED_PARQUET = "src/data/processed/profiles.parquet"
+DUPLICATES_JSON = "src/data/processed/duplicates.json"
+PROFILES_MANIFEST = "src/data/processed/profiles_manifest.json"
 
 def clean_text(text):
     """Clean and normalize text content"""
@@ -315,13 +320,8 @@ def create_embedding_text(
     
     return "\n".join(parts)
 
-# load CSV
-df = pd.read_csv(RAW_CSV)
-df = df.fillna('')
-
-processed_profiles = []
-
-for _, row in df.iterrows():
+def process_row(row) -> Dict[str, Any]:
+    """Turn one raw CSV row into a lightweight profile with its embedding text"""
     # parse JSON fields
     experience_data = parse_json_field(row['experience'])
     education_data = parse_json_field(row['education'])
@@ -377,12 +377,115 @@ for _, row in df.iterrows():
         "profile_id": clean_text(row['id'])
     }
     
-    processed_profiles.append(profile)
+    return profile
+
+def process_dataframe(df) -> List[Dict[str, Any]]:
+    """Process every row of the raw profiles dataframe"""
+    return [process_row(row) for _, row in df.iterrows()]
+
+def save_profiles_json(processed_profiles: List[Dict[str, Any]]):
+    """Save processed profiles as json, replacing the old file only once the new one is complete"""
+    tmp_path = PROCESSED_JSON + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(processed_profiles, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, PROCESSED_JSON)
+
+def save_duplicates(duplicates: Dict[str, Dict[str, Any]]):
+    """Save the dropped csv row -> canonical output row mapping as json"""
+    with open(DUPLICATES_JSON, 'w', encoding='utf-8') as f:
+        json.dump(duplicates, f, ensure_ascii=False, indent=2)
+
+def save_manifest(profiles_file: str, num_profiles: int):
+    """Record which processed profiles file this run wrote, for create_embeddings.py to read"""
+    with open(PROFILES_MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump({'profiles_file': profiles_file, 'num_profiles': num_profiles}, f, indent=2)
+
+def main(output_format: str = "parquet"):
+    """Main function to preprocess the raw LinkedIn CSV.
+
+    Rows are read in chunks, deduplicated as they arrive, and streamed to
+    Parquet in row groups of ROW_GROUP_SIZE kept profiles; json output still
+    collects every profile. Outputs are written to temporary files and only
+    replace the previous ones on success, and the file written this run is
+    recorded in PROFILES_MANIFEST so a leftover file of the other format is
+    never read downstream.
+    """
+    import pandas as pd
+
+    write_parquet = output_format in ("parquet", "both")
+    write_json = output_format in ("json", "both")
+    if write_parquet:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("pyarrow not installed; install with: pip install pyarrow (falling back to json)")
+            write_parquet, write_json = False, True
 
-# save
-os.makedirs(os.path.dirname(PROCESSED_JSON), exist_ok=True)
-with open(PROCESSED_JSON, 'w', encoding='utf-8') as f:
-    json.dump(processed_profiles, f, ensure_ascii=False, indent=2)
+    os.makedirs(os.path.dirname(PROCESSED_JSON), exist_ok=True)
 
-print(f"profiles saved to {PROCESSED_JSON}")
-print(f"total profiles processed: {len(processed_profiles)}")
\ No newline at end of file
+    parquet_writer = None
+    parquet_tmp = PROCESSED_PARQUET + ".tmp"
+    if write_parquet:
+        from profile_store import ProfileParquetWriter
+        parquet_writer = ProfileParquetWriter(parquet_tmp)
+
+    # drop repeated and near-identical profiles before they are embedded
+    deduplicator = ProfileDeduplicator()
+    # keyed by the dropped profile's 0-based raw CSV row; canonical_row indexes the processed output
+    duplicates: Dict[str, Dict[str, Any]] = {}
+    json_profiles: List[Dict[str, Any]] = []
+    total = 0
+    kept = 0
+
+    try:
+        # read every column as text so each chunk parses identically (no per-chunk dtype guessing)
+        for chunk in pd.read_csv(RAW_CSV, chunksize=ROW_GROUP_SIZE, dtype=str, keep_default_na=False):
+            for profile in process_dataframe(chunk):
+                csv_row = total
+                total += 1
+                canonical_row = deduplicator.add(profile)
+                if canonical_row is not None:
+                    duplicates[str(csv_row)] = {
+                        'profile_id': profile['profile_id'],
+                        'profile_url': profile['profile_url'],
+                        'canonical_row': canonical_row,
+                    }
+                    continue
+                kept += 1
+                if parquet_writer is not None:
+                    parquet_writer.write(profile)
+                if write_json:
+                    json_profiles.append(profile)
+        if parquet_writer is not None:
+            parquet_writer.close()
+    except BaseException:
+        # never leave a truncated parquet file behind
+        if parquet_writer is not None:
+            parquet_writer.abort()
+        raise
+
+    print(f"removed {len(duplicates)} duplicate profiles ({total} -> {kept})")
+
+    # save
+    if write_json:
+        save_profiles_json(json_profiles)
+        print(f"profiles saved to {PROCESSED_JSON}")
+    if write_parquet:
+        os.replace(parquet_tmp, PROCESSED_PARQUET)
+        print(f"profiles saved to {PROCESSED_PARQUET}")
+    save_duplicates(duplicates)
+    save_manifest(PROCESSED_PARQUET if write_parquet else PROCESSED_JSON, kept)
+
+    print(f"duplicate mapping saved to {DUPLICATES_JSON}")
+    print(f"total profiles processed: {kept}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess raw LinkedIn profiles")
+    parser.add_argument(
+        "--format",
+        choices=["parquet", "json", "both"],
+        default="parquet",
+        help="output format for processed profiles (default: parquet)",
+    )
+    args = parser.parse_args()
+    main(args.format)
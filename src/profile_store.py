@@ -0,0 +1,85 @@
+import os
+from typing import List, Dict, Any, Optional
+
+# column order of the processed profiles table; every field is a string
+PROFILE_FIELDS = [
+    "name",
+    "position",
+    "about",
+    "profile_url",
+    "avatar",
+    "city",
+    "country_code",
+    "region",
+    "current_company",
+    "company_id",
+    "embedding_text",
+    "timestamp",
+    "profile_id",
+]
+
+ROW_GROUP_SIZE = 1000
+
+def profile_schema():
+    """Arrow schema for processed profiles"""
+    import pyarrow as pa
+    return pa.schema([pa.field(name, pa.string()) for name in PROFILE_FIELDS])
+
+class ProfileParquetWriter:
+    """Write processed profiles to Parquet, flushing a row group every row_group_size profiles"""
+
+    def __init__(self, path: str, row_group_size: int = ROW_GROUP_SIZE):
+        import pyarrow.parquet as pq
+        self.path = path
+        self.schema = profile_schema()
+        self.row_group_size = row_group_size
+        self.writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        self.buffer: List[Dict[str, Any]] = []
+        self.num_rows = 0
+
+    def write(self, profile: Dict[str, Any]):
+        self.buffer.append(profile)
+        if len(self.buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        import pyarrow as pa
+        columns = {
+            name: [None if p.get(name) is None else str(p[name]) for p in self.buffer]
+            for name in PROFILE_FIELDS
+        }
+        self.writer.write_table(pa.Table.from_pydict(columns, schema=self.schema))
+        self.num_rows += len(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def abort(self):
+        """Close without flushing buffered profiles and delete the partial file"""
+        self.buffer = []
+        self.writer.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def read_profiles_parquet(path: str, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Load profiles from Parquet as dicts, reading only the requested columns"""
+    import pyarrow.parquet as pq
+    return pq.read_table(path, columns=columns).to_pylist()
+
+def read_column_parquet(path: str, column: str) -> List[Any]:
+    """Load a single column from Parquet as a list"""
+    import pyarrow.parquet as pq
+    return pq.read_table(path, columns=[column]).column(column).to_pylist()
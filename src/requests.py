@@ -1,5 +1,11 @@
+from typing import List
 from pydantic import BaseModel
 
 class SearchRequest(BaseModel):
     query: str
-    num_results: int = 10
\ No newline at end of file
+    num_results: int = 10
+    offset: int = 0
+
+class ShardSearchRequest(BaseModel):
+    embedding: List[float]
+    k: int = 10
@@ -0,0 +1,57 @@
+import numpy as np
+from concurrent.futures import Executor
+from typing import List, Optional, Tuple
+
+def shard_bounds(num_rows: int, num_shards: int) -> List[Tuple[int, int]]:
+    """Split [0, num_rows) into num_shards contiguous (start, end) ranges of near-equal size"""
+    num_shards = max(1, min(num_shards, num_rows)) if num_rows else 1
+    base, extra = divmod(num_rows, num_shards)
+    bounds = []
+    start = 0
+    for i in range(num_shards):
+        end = start + base + (1 if i < extra else 0)
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+def local_top_k(query: np.ndarray, matrix: np.ndarray, k: int, offset: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Score one shard and return its top-k (global indices, scores), best first"""
+    if k <= 0 or len(matrix) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    # matrix-vector product runs in BLAS, which releases the GIL
+    scores = matrix @ query
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return top + offset, scores[top]
+
+def merge_top_k(partials: List[Tuple[np.ndarray, np.ndarray]], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge per-shard top-k lists into a global top-k"""
+    partials = [p for p in partials if len(p[0])]
+    if not partials:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    indices = np.concatenate([np.asarray(p[0], dtype=np.int64) for p in partials])
+    scores = np.concatenate([np.asarray(p[1], dtype=np.float32) for p in partials])
+    order = np.argsort(-scores, kind='stable')[:k]
+    return indices[order], scores[order]
+
+def parallel_top_k(
+    query: np.ndarray,
+    matrix: np.ndarray,
+    k: int,
+    num_shards: int = 1,
+    executor: Optional[Executor] = None,
+    offset: int = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Partition matrix into shards, score them on executor, and merge the local top-k lists"""
+    bounds = shard_bounds(len(matrix), num_shards)
+    if executor is None or len(bounds) == 1:
+        return local_top_k(query, matrix, k, offset)
+
+    futures = [
+        executor.submit(local_top_k, query, matrix[start:end], k, offset + start)
+        for start, end in bounds
+    ]
+    return merge_top_k([f.result() for f in futures], k)
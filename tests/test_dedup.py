@@ -0,0 +1,20 @@
+import numpy as np
+from dedup import vector_canonical_ids
+
+def near_identical_vectors():
+    base = np.random.RandomState(0).rand(16)
+    other = base.copy()
+    other[0] += 1e-3
+    unrelated = np.random.RandomState(1).rand(16) - 0.5
+    return np.stack([base, other, unrelated])
+
+def test_vector_pass_links_near_identical_vectors_with_same_name():
+    names = ["Jane Doe", "jane  doe.", "Someone Else"]
+    assert vector_canonical_ids(near_identical_vectors(), names) == [0, 0, 2]
+
+def test_vector_pass_keeps_different_names_separate():
+    names = ["Jane Doe", "John Smith", "Someone Else"]
+    assert vector_canonical_ids(near_identical_vectors(), names) == [0, 1, 2]
+
+def test_vector_pass_without_names_links_on_similarity_alone():
+    assert vector_canonical_ids(near_identical_vectors()) == [0, 0, 2]